@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""
+Benchmark of METAXSFR stages on the shipped sample/ reports, fits the per-process
+resource model used by `metaxsfr` preflight and writes it to resource_model.json
+
+Each stage script is run as in main.nf on inputs built from sample/ (reports replicated
+under new sample ids to get larger cohorts, --min_percent 0 as the worst case) and its
+peak RSS is taken from wait4(). A straight line memory_mb = base_mb + mb_per_unit * units
+is then least-squares fitted per process against the report statistic named in 'scale'.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(os.path.abspath(__file__))))
+BIN_DIR = os.path.join(REPO_DIR, 'bin')
+SAMPLE_DIR = os.path.join(REPO_DIR, 'sample')
+MODEL_PATH = os.path.join(REPO_DIR, 'benchmark', 'resource_model.json')
+
+sys.path.insert(0, REPO_DIR)
+from metaxsfr import TAXID_NCBI, TAXID_GTDB, TAXRANK_NCBI, TAXRANK_GTDB
+
+def taxonomy_args(report_type):
+    #sample/ kraken2 and bracken reports are GTDB-based, metaphlan4 reports NCBI-based
+    if report_type == 'metaphlan4':
+        return ['--taxids_map', json.dumps(TAXID_NCBI), '--taxranks', ','.join(TAXRANK_NCBI)]
+    return ['--taxids_map', json.dumps(TAXID_GTDB), '--taxranks', ','.join(TAXRANK_GTDB)]
+
+REPLICATES = [1, 4, 8]
+
+#ru_maxrss survives fork/exec, so stages are launched from a small process started before
+#the benchmark loads any data, otherwise every stage reports at least the benchmark's own RSS
+LAUNCHER = """
+import json, os, sys
+for line in sys.stdin:
+    cmd, cwd = json.loads(line)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.chdir(cwd)
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            os.execvp(cmd[0], cmd)
+        finally:
+            os._exit(127)
+    _, status, usage = os.wait4(pid, 0)
+    print(json.dumps([os.waitstatus_to_exitcode(status), usage.ru_maxrss]), flush=True)
+"""
+
+class Launcher:
+    def __init__(self):
+        self.proc = subprocess.Popen([sys.executable, '-c', LAUNCHER], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def peak_rss_mb(self, cmd, cwd):
+        self.proc.stdin.write(json.dumps([cmd, cwd]) + '\n')
+        self.proc.stdin.flush()
+        returncode, max_rss_kb = json.loads(self.proc.stdout.readline())
+        if returncode != 0:
+            raise RuntimeError(f"Benchmark command failed ({returncode}): {' '.join(cmd)}")
+        return max_rss_kb / 1024
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+def count_rows(file_path):
+    with open(file_path, 'rb') as f:
+        return sum(1 for _ in f)
+
+def script(name):
+    return [sys.executable, os.path.join(BIN_DIR, name)]
+
+def parse_args_for(input_id, report, report_type, out_dir):
+    return ['--input_id', input_id, '--input_report', report, '--report_type', report_type] + taxonomy_args(report_type) + [
+            '--out_summary', os.path.join(out_dir, f"{input_id}_sample_summary.tsv"),
+            '--out_taxonomy', os.path.join(out_dir, f"{input_id}_taxonomy_table.tsv"),
+            '--min_percent', '0']
+
+def replicate_table(src, dst, input_id, id_col_name):
+    #copy a per-sample table under a new sample id
+    with open(src, 'r', newline='') as f_in, open(dst, 'w', newline='') as f_out:
+        header = f_in.readline()
+        f_out.write(header)
+        id_col = header.rstrip('\r\n').split('\t').index(id_col_name)
+        for line in f_in:
+            fields = line.split('\t')
+            fields[id_col] = input_id
+            f_out.write('\t'.join(fields))
+
+def write_combined_report(reports, out_path, num_samples):
+    #combine_kreports.py layout over the tree of the first report, columns cycle through the reports
+    per_report = []
+    for report in reports:
+        reads = {}
+        with open(report) as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                reads[fields[4]] = (fields[1], fields[2])
+        per_report.append(reads)
+
+    with open(reports[0]) as f_in, open(out_path, 'w') as f_out:
+        f_out.write(f"#Number of Samples: {num_samples}\n")
+        f_out.write("#perc\ttot_all\ttot_lvl\t" + '\t'.join(f"S{i}_all\tS{i}_lvl" for i in range(num_samples)) + "\tlvl_type\ttaxid\tname\n")
+        for line in f_in:
+            fields = line.rstrip('\n').split('\t')
+            columns = []
+            for i in range(num_samples):
+                columns.extend(per_report[i % len(per_report)].get(fields[4], ('0', '0')))
+            f_out.write('\t'.join(fields[:3] + columns + fields[3:]) + '\n')
+
+def fit_line(points):
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x if var_x > 0 else 0.0
+
+    #memory never shrinks with input size, fall back to the peak as a constant
+    if slope <= 0:
+        return max(y for _, y in points), 0.0
+    base = max(0.0, mean_y - slope * mean_x)
+    return base, slope
+
+def run_benchmark(work_dir, launcher):
+    peak_rss_mb = launcher.peak_rss_mb
+    measurements = {}
+
+    def record(process_name, scale, x, mb, per_cpu=False):
+        entry = measurements.setdefault(process_name, {'scale': scale, 'per_cpu': per_cpu, 'points': []})
+        entry['points'].append([round(x, 4), round(mb, 2)])
+        print(f"{process_name}: {scale}={x:.4g} peak={mb:.1f} MB")
+
+    kraken_reports = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'kraken2', '*.txt')))
+    bracken_reports = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'bracken', '*.txt')))
+    metaphlan_reports = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'metaphlan4', '*.txt')))
+
+    #per-sample parsers, one point per report
+    parsed_dir = os.path.join(work_dir, 'parsed')
+    os.makedirs(parsed_dir)
+    for report_type, reports in [('kraken2', kraken_reports), ('bracken', bracken_reports)]:
+        for report in reports:
+            input_id = f"{report_type}_{os.path.basename(report).split('.')[0]}"
+            mb = peak_rss_mb(script('processKrakenBrackenReport.py') + parse_args_for(input_id, report, report_type, parsed_dir), work_dir)
+            record('PROCESSING_KRAKENLIKE_REPORTS', 'max_rows', count_rows(report), mb)
+    for report in metaphlan_reports:
+        input_id = f"metaphlan4_{os.path.basename(report).split('.')[0]}"
+        mb = peak_rss_mb(script('processMetaphlan4Report.py') + parse_args_for(input_id, report, 'metaphlan4', work_dir), work_dir)
+        record('PROCESSING_METAPHLAN4_REPORTS', 'max_rows', count_rows(report), mb)
+
+    #archive parser with a single worker, one report per archive (memory is per process)
+    for report in bracken_reports:
+        archive = os.path.join(work_dir, 'single.tar.gz')
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(report, arcname=os.path.basename(report))
+        mb = peak_rss_mb(script('processReportArchive.py') + [
+            '--input_archive', archive, '--report_type', 'bracken'] + taxonomy_args('bracken') + [
+            '--out_dir', os.path.join(work_dir, 'archive_out'),
+            '--min_percent', '0', '--threads', '1'], work_dir)
+        record('PROCESSING_REPORT_ARCHIVES', 'max_rows', count_rows(report), mb, per_cpu=True)
+
+    #combined report, growing number of sample columns
+    for replicate in REPLICATES:
+        num_samples = len(kraken_reports) * replicate
+        combined = os.path.join(work_dir, f"combined_{num_samples}.txt")
+        write_combined_report(kraken_reports, combined, num_samples)
+        mb = peak_rss_mb(script('processCombinedKreport.py') + [
+            '--input_report', combined, '--report_type', 'kraken2'] + taxonomy_args('kraken2') + [
+            '--out_dir', os.path.join(work_dir, f"combined_out_{num_samples}"),
+            '--min_percent', '0'], work_dir)
+        record('PROCESSING_COMBINED_KREPORTS', 'total_mb', os.path.getsize(combined) / (1024 * 1024), mb)
+
+    #compile, generate and validate on kraken2 cohorts replicated under new sample ids
+    kraken_ids = [f"kraken2_{os.path.basename(r).split('.')[0]}" for r in kraken_reports]
+    kraken_mb = sum(os.path.getsize(r) for r in kraken_reports) / (1024 * 1024)
+    for replicate in REPLICATES:
+        cohort_dir = os.path.join(work_dir, f"cohort_{replicate}")
+        os.makedirs(cohort_dir)
+        summaries = []
+        taxonomies = []
+        for r in range(replicate):
+            for input_id in kraken_ids:
+                new_id = f"{input_id}_r{r}"
+                summaries.append(os.path.join(cohort_dir, f"{new_id}_sample_summary.tsv"))
+                taxonomies.append(os.path.join(cohort_dir, f"{new_id}_taxonomy_table.tsv"))
+                replicate_table(os.path.join(parsed_dir, f"{input_id}_sample_summary.tsv"), summaries[-1], new_id, 'id')
+                replicate_table(os.path.join(parsed_dir, f"{input_id}_taxonomy_table.tsv"), taxonomies[-1], new_id, 'sample')
+        num_reports = len(summaries)
+        total_mb = kraken_mb * replicate
+
+        #two chunks per cohort so the chunk size grows with it
+        chunk_size = max(len(kraken_ids), num_reports // 2)
+        partial_summaries = []
+        partial_taxonomies = []
+        for i in range(0, num_reports, chunk_size):
+            partial_summaries.append(os.path.join(cohort_dir, f"chunk{i}.summaryTable.tsv"))
+            partial_taxonomies.append(os.path.join(cohort_dir, f"chunk{i}.taxonomyTable.tsv"))
+            mb = peak_rss_mb(script('compileSampleSummaries.py') + ['--out', partial_summaries[-1]] + summaries[i:i + chunk_size], cohort_dir)
+            record('COMPILING_SUMMARY_CHUNKS', 'chunk_reports', len(summaries[i:i + chunk_size]), mb)
+            mb = peak_rss_mb(script('compileTaxonomyTables.py') + ['--out', partial_taxonomies[-1]] + taxonomies[i:i + chunk_size], cohort_dir)
+            record('COMPILING_TAXONOMY_CHUNKS', 'total_mb', total_mb * len(summaries[i:i + chunk_size]) / num_reports, mb)
+
+        #final merges, the taxonomy merge also builds the optional tree
+        mb = peak_rss_mb(script('compileSampleSummaries.py') + ['--merge', '--out', 'summaryTable.tsv'] + partial_summaries, cohort_dir)
+        record('COMPILING_SUMMARIES', 'num_reports', num_reports, mb)
+        mb_tables = peak_rss_mb(script('compileTaxonomyTables.py') + ['--out', 'taxonomyTable.tsv'] + partial_taxonomies, cohort_dir)
+        mb_tree = peak_rss_mb(script('compileTaxonomyTree.py') + ['--taxonomy_table', 'taxonomyTable.tsv', '--out', 'taxonomyTree.json'], cohort_dir)
+        record('COMPILING_TAXONOMIES', 'total_mb', total_mb, max(mb_tables, mb_tree))
+
+        #report generation with the optional query database
+        with open(os.path.join(cohort_dir, 'params.json'), 'w') as f:
+            f.write('{}')
+        mb = peak_rss_mb(script('generateMetaxsfr.py') + [
+            '--summary_table', 'summaryTable.tsv', '--taxonomy_table', 'taxonomyTable.tsv',
+            '--template', os.path.join(BIN_DIR, 'metaxsfr_template.html'), '--out_html', 'metaxsfr.html',
+            '--params_data', 'params.json', '--pipeline_version', 'benchmark', '--out_sqlite', 'metaxsfr.sqlite'], cohort_dir)
+        record('GENERATING_REPORT', 'total_mb', total_mb, mb)
+
+        #same checks as the VALIDATE_REPORT script
+        mb = peak_rss_mb(['bash', '-c',
+            "awk '/@@METAXSFR@@INPUT@@START@@/ && /@@METAXSFR@@INPUT@@END@@/' metaxsfr.html | grep -q . && "
+            "gzip -4 -c metaxsfr.html > metaxsfr.result.html.gz"], cohort_dir)
+        record('VALIDATE_REPORT', 'total_mb', total_mb, mb)
+
+    return measurements
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the METAXSFR per-process resource model on the sample/ reports")
+    parser.add_argument("--out", help="Output model JSON", default=MODEL_PATH)
+    parser.add_argument("--work_dir", help="Scratch directory (default: temporary, removed afterwards)", default=None)
+    args = parser.parse_args()
+
+    launcher = Launcher()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='metaxsfr_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        measurements = run_benchmark(work_dir, launcher)
+    finally:
+        launcher.close()
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    processes = {}
+    for process_name, entry in measurements.items():
+        base_mb, mb_per_unit = fit_line(entry['points'])
+        processes[process_name] = {
+            'scale': entry['scale'],
+            'base_mb': round(base_mb, 2),
+            'mb_per_unit': round(mb_per_unit, 6),
+            'per_cpu': entry['per_cpu'],
+            'points': entry['points']
+        }
+
+    model = {
+        'description': "memory_mb = base_mb + mb_per_unit * units ('per_cpu' models are per worker process), "
+                       "fitted by benchmark/fit_resource_model.py on peak RSS over the sample/ reports",
+        'python': sys.version.split()[0],
+        'processes': processes
+    }
+    with open(args.out, 'w') as f:
+        json.dump(model, f, indent=2)
+    print(f"Resource model written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,28 @@ def compileSummaries(summary_files, out):
     wide_data = transform_to_wide_format(all_rows)
     write_tsv(wide_data, out)
 
+def mergeSummaries(compiled_files, out):
+    print(f"Merging {len(compiled_files)} compiled summary files")
+    if len(compiled_files) == 0:
+        raise ValueError("No compiled summary files provided")
+    
+    #back to long rows, taxa columns are unioned by the wide transform
+    all_rows = []
+    for file_path in compiled_files:
+        print(f"Reading file: {file_path}")
+        with open(file_path, 'r') as file:
+            reader = csv.reader(file, delimiter='\t')
+            taxa_columns = next(reader)[1:]
+            
+            for row in reader:
+                if not row:
+                    continue
+                for taxon, clade_reads in zip(taxa_columns, row[1:]):
+                    all_rows.append({'id': row[0], 'taxon': taxon, 'cladeReads': clade_reads})
+    
+    wide_data = transform_to_wide_format(all_rows)
+    write_tsv(wide_data, out)
+
 def transform_to_wide_format(rows):
     sample_data = defaultdict(dict)
     all_taxa = set()
@@ -66,11 +88,15 @@ def write_tsv(data, output_file):
 def main():
     parser = argparse.ArgumentParser(description="Compile summaries into a flat json file")
     parser.add_argument("--out", help="Output name for compiled summaries file", required=True)
+    parser.add_argument("--merge", help="Inputs are compiled (wide) summary tables to merge", action="store_true", default=False)
     parser.add_argument("summary_files", nargs='+', help="One or more summary files to process")
     args = parser.parse_args()
     
     try:
-        compileSummaries(args.summary_files, args.out)
+        if args.merge:
+            mergeSummaries(args.summary_files, args.out)
+        else:
+            compileSummaries(args.summary_files, args.out)
     except Exception as e:
         print(f"Error: {str(e)}")
         exit(1)
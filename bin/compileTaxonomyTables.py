@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+import argparse
+import shutil
+
+def compileTaxonomies(taxonomy_files, out):
+    print(f"Processing {len(taxonomy_files)} taxonomy files")
+    if len(taxonomy_files) == 0:
+        raise ValueError("No taxonomy files provided")
+    
+    header = None
+    with open(out, 'wb') as out_file:
+        #concatenate in input order, single header
+        for file_path in taxonomy_files:
+            with open(file_path, 'rb') as file:
+                current_header = file.readline()
+                if header is None:
+                    header = current_header
+                    out_file.write(header)
+                elif current_header != header:
+                    raise ValueError(f"Taxonomy table header mismatch in {file_path}")
+                shutil.copyfileobj(file, out_file)
+    
+    print(f"TSV file written to {out}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile per-sample or partially compiled taxonomy tables into one table")
+    parser.add_argument("--out", help="Output name for compiled taxonomy file", required=True)
+    parser.add_argument("taxonomy_files", nargs='+', help="One or more taxonomy files to concatenate")
+    args = parser.parse_args()
+    
+    try:
+        compileTaxonomies(args.taxonomy_files, args.out)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+import argparse
+import csv
+import json
+
+def build_taxonomy_tree(header, rows):
+    #header/rows as in the taxonomy tables: sample, percentage, cladeReads, name, taxRank, then one column per rank
+    samples = []
+    sample_idx = {}
+    nodes = {}
+    ranks = header[5:]
+
+    for row in rows:
+        if len(row) < 5 + len(ranks):
+            continue
+        sample, percentage, clade_reads, name, rank = row[:5]
+        if rank not in ranks:
+            continue
+
+        if sample not in sample_idx:
+            sample_idx[sample] = len(samples)
+            samples.append(sample)
+
+        #lineage path keyed by the non-empty rank values down to the node's own rank
+        rank_values = row[5:5 + len(ranks)]
+        path = tuple((r, value) for r, value in zip(ranks[:ranks.index(rank) + 1], rank_values) if value)
+        if not path:
+            continue
+
+        node = nodes.get(path)
+        if node is None:
+            node = {'name': name, 'rank': rank, 'values': {}}
+            nodes[path] = node
+        node['values'][sample_idx[sample]] = (float(percentage), int(clade_reads))
+
+    #parents sort before their children
+    paths = sorted(nodes.keys())
+    path_idx = {path: i for i, path in enumerate(paths)}
+
+    tree_nodes = []
+    for path in paths:
+        node = nodes[path]
+
+        #attach to the nearest ancestor present in the table
+        parent = -1
+        for depth in range(len(path) - 1, 0, -1):
+            if path[:depth] in path_idx:
+                parent = path_idx[path[:depth]]
+                break
+
+        clade_reads = [0] * len(samples)
+        percentages = [0] * len(samples)
+        for i, (percentage, reads) in node['values'].items():
+            percentages[i] = percentage
+            clade_reads[i] = reads
+
+        tree_nodes.append({
+            'name': node['name'],
+            'taxRank': node['rank'],
+            'parent': parent,
+            'cladeReads': clade_reads,
+            'percentage': percentages
+        })
+
+    return {
+        'samples': samples,
+        'ranks': ranks,
+        'nodes': tree_nodes
+    }
+
+def compileTaxonomyTree(taxonomy_table, out):
+    print(f"Building merged taxonomy tree from {taxonomy_table}")
+
+    with open(taxonomy_table, 'r', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        tree = build_taxonomy_tree(header, reader)
+
+    with open(out, 'w') as f:
+        json.dump(tree, f, separators=(',', ':'))
+    print(f"Merged taxonomy tree with {len(tree['nodes'])} nodes across {len(tree['samples'])} samples written to {out}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-sample taxonomy rows into one tree with per-sample abundance vectors")
+    parser.add_argument("--taxonomy_table", help="Compiled taxonomy table (TSV)", required=True)
+    parser.add_argument("--out", help="Output name for taxonomy tree JSON file", required=True)
+    args = parser.parse_args()
+
+    try:
+        compileTaxonomyTree(args.taxonomy_table, args.out)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
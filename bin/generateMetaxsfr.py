@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 import argparse
+import csv
 import datetime
 import json
 from scifrMutator import mutate_template_memory
+from metaxsfrDatabase import write_query_database
 
 def convert_tsv_to_flat_string(file_path):
    try:
@@ -13,6 +15,68 @@ def convert_tsv_to_flat_string(file_path):
        print(f"Warning: Could not read file {file_path}: {str(e)}")
        return 'NA'
 
+def build_taxon_search_index(header, rows, prefix_length=2):
+   #sorted name table with prefix ranges, each taxon maps to the samples and table rows it occurs in
+   taxa = {}
+   samples = []
+   sample_idx = {}
+   sample_col = header.index('sample')
+   name_col = header.index('name')
+   rank_col = header.index('taxRank')
+   
+   #row numbers follow the data rows of the taxonomy table (header excluded)
+   for row_idx, fields in enumerate(rows):
+       if len(fields) <= max(sample_col, name_col, rank_col):
+           continue
+       sample, name, rank = fields[sample_col], fields[name_col], fields[rank_col]
+       if sample not in sample_idx:
+           sample_idx[sample] = len(samples)
+           samples.append(sample)
+       
+       taxon = taxa.get((name, rank))
+       if taxon is None:
+           #search on the name without its rank prefix, e.g. g_Escherichia -> escherichia
+           rank_prefix = f"{rank.lower()}_"
+           key = name[len(rank_prefix):] if name.lower().startswith(rank_prefix) else name
+           taxon = {'key': key.lower(), 'samples': [], 'rows': []}
+           taxa[(name, rank)] = taxon
+       if not taxon['samples'] or taxon['samples'][-1] != sample_idx[sample]:
+           taxon['samples'].append(sample_idx[sample])
+       taxon['rows'].append(row_idx)
+   
+   ordered = sorted(taxa.items(), key=lambda item: (item[1]['key'], item[0][1]))
+   keys = [taxon['key'] for _, taxon in ordered]
+   
+   #[start, end) ranges into the sorted table per lowercase prefix
+   prefix_ranges = {}
+   for i, key in enumerate(keys):
+       prefix = key[:prefix_length]
+       if prefix in prefix_ranges:
+           prefix_ranges[prefix][1] = i + 1
+       else:
+           prefix_ranges[prefix] = [i, i + 1]
+   
+   return {
+       "prefixLength": prefix_length,
+       "sampleIds": samples,
+       "keys": keys,
+       "names": [name for (name, _), _ in ordered],
+       "ranks": [rank for (_, rank), _ in ordered],
+       "samples": [taxon['samples'] for _, taxon in ordered],
+       "rows": [taxon['rows'] for _, taxon in ordered],
+       "prefixRanges": prefix_ranges
+   }
+
+def write_taxon_search_index(taxonomy_table, out):
+   with open(taxonomy_table, 'r', newline='') as tsv_file:
+       reader = csv.reader(tsv_file, delimiter='\t')
+       header = next(reader)
+       search_index = build_taxon_search_index(header, reader)
+   
+   with open(out, 'w') as json_file:
+       json.dump(search_index, json_file, separators=(',', ':'))
+   print(f"Taxon search index with {len(search_index['keys'])} taxa written to {out}")
+
 def generate_metaxsfr_json(summary_table, taxonomy_table, params_json, pipeline_version):
    #summary data
    summary_data = 'NA'
@@ -67,7 +131,7 @@ def generate_metaxsfr_json(summary_table, taxonomy_table, params_json, pipeline_
    }
    return combined_data
 
-def generate_metaxsfr(summary_table, taxonomy_table, template_path, out_html, out_json, params_json, pipeline_version, save_intermediate=False):
+def generate_metaxsfr(summary_table, taxonomy_table, template_path, out_html, out_json, params_json, pipeline_version, save_intermediate=False, out_sqlite=None, out_search_index=None):
    try:
        combined_data = generate_metaxsfr_json(summary_table, taxonomy_table, params_json, pipeline_version)
        
@@ -84,6 +148,14 @@ def generate_metaxsfr(summary_table, taxonomy_table, template_path, out_html, ou
        print(f"Successfully generated METAXSFR report: {out_html}")
        if save_intermediate:
            print(f"JSON data saved to: {out_json}")
+       
+       #companion query database
+       if out_sqlite:
+           write_query_database(summary_table, taxonomy_table, out_sqlite, pipeline_version)
+       
+       #companion taxon search index, read by metaxsfr serve (/api/search), not embedded in the report
+       if out_search_index:
+           write_taxon_search_index(taxonomy_table, out_search_index)
            
    except Exception as e:
        print(f"Error generating METAXSFR report: {str(e)}")
@@ -99,6 +171,8 @@ def main():
    parser.add_argument("--params_data", help="Parameters JSON file", required=True)
    parser.add_argument("--pipeline_version", help="Pipeline version", required=True)
    parser.add_argument("--save_intermediate", help="Save intermediate JSON file", action="store_true", default=False)
+   parser.add_argument("--out_sqlite", help="Output SQLite query database (optional)")
+   parser.add_argument("--out_search_index", help="Output taxon search index JSON (optional)")
    
    args = parser.parse_args()
    save_json = args.save_intermediate and args.out_json is not None
@@ -111,7 +185,9 @@ def main():
        args.out_json,
        args.params_data,
        args.pipeline_version,
-       save_json
+       save_json,
+       args.out_sqlite,
+       args.out_search_index
    )
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Writer of METAXSFR query database (SQLite)
+"""
+import argparse
+import csv
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE samples (sample_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE taxa (taxon_id INTEGER PRIMARY KEY, name TEXT NOT NULL, label TEXT NOT NULL, rank TEXT NOT NULL, lineage TEXT NOT NULL);
+CREATE TABLE abundance (sample_id INTEGER NOT NULL, taxon_id INTEGER NOT NULL, percentage REAL, cladeReads INTEGER);
+CREATE TABLE summary (sample_id INTEGER NOT NULL, taxon TEXT NOT NULL, cladeReads INTEGER);
+"""
+
+#indexes are built after the bulk load
+INDEXES = """
+CREATE INDEX idx_taxa_name ON taxa (name COLLATE NOCASE);
+CREATE INDEX idx_taxa_label ON taxa (label COLLATE NOCASE);
+CREATE INDEX idx_taxa_rank ON taxa (rank);
+CREATE INDEX idx_taxa_lineage ON taxa (lineage);
+CREATE INDEX idx_abundance_sample ON abundance (sample_id);
+CREATE INDEX idx_abundance_taxon ON abundance (taxon_id, percentage);
+CREATE INDEX idx_summary_sample ON summary (sample_id);
+"""
+
+def to_number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+def write_query_database(summary_table, taxonomy_table, out_db, pipeline_version=None):
+    if os.path.exists(out_db):
+        os.remove(out_db)
+
+    conn = sqlite3.connect(out_db)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    samples = {}
+    taxa = {}
+
+    def sample_id(name):
+        if name not in samples:
+            samples[name] = len(samples) + 1
+        return samples[name]
+
+    def taxonomy_rows(reader, ranks):
+        for row in reader:
+            if len(row) < 5 + len(ranks):
+                continue
+            rank_values = row[5:5 + len(ranks)]
+            rank = row[4]
+            lineage = '|'.join(rank_values)
+            name = rank_values[ranks.index(rank)] if rank in ranks else row[3]
+            key = (row[3], rank, lineage)
+            if key not in taxa:
+                taxa[key] = (len(taxa) + 1, name)
+            yield (sample_id(row[0]), taxa[key][0], to_number(row[1], float), to_number(row[2], int))
+
+    def summary_rows(reader, taxa_columns):
+        for row in reader:
+            if not row:
+                continue
+            sid = sample_id(row[0])
+            for taxon, reads in zip(taxa_columns, row[1:]):
+                yield (sid, taxon, to_number(reads, int))
+
+    conn.executescript(SCHEMA)
+    ranks = []
+
+    #single transaction for the whole load
+    with conn:
+        if taxonomy_table:
+            with open(taxonomy_table, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                header = next(reader)
+                ranks = header[5:]
+                conn.executemany("INSERT INTO abundance VALUES (?, ?, ?, ?)", taxonomy_rows(reader, ranks))
+
+        if summary_table:
+            with open(summary_table, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                header = next(reader)
+                conn.executemany("INSERT INTO summary VALUES (?, ?, ?)", summary_rows(reader, header[1:]))
+
+        conn.executemany("INSERT INTO samples VALUES (?, ?)", ((sid, name) for name, sid in samples.items()))
+        conn.executemany("INSERT INTO taxa VALUES (?, ?, ?, ?, ?)",
+                         ((tid, name, label, rank, lineage) for (label, rank, lineage), (tid, name) in taxa.items()))
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('taxranks', ','.join(ranks)),
+            ('pipeline_version', pipeline_version or 'NA')
+        ])
+
+    conn.executescript(INDEXES)
+    conn.close()
+    print(f"Query database written to {out_db} ({len(samples)} samples, {len(taxa)} taxa)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Write METAXSFR query database")
+    parser.add_argument("--summary_table", help="Sample summary table (TSV)", required=True)
+    parser.add_argument("--taxonomy_table", help="Taxonomy table (TSV)", required=True)
+    parser.add_argument("--out", help="Output SQLite file", required=True)
+    parser.add_argument("--pipeline_version", help="Pipeline version", default=None)
+    args = parser.parse_args()
+
+    write_query_database(args.summary_table, args.taxonomy_table, args.out, args.pipeline_version)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import re
+from processKrakenBrackenReport import write_sample_summary, write_taxonomy_table
+
+def processCombinedReport(input_report, report_type, taxids_map, taxranks, out_dir, min_percent_abundance):
+    print(f"Processing combined report: {input_report}")
+
+    #taxids map
+    try:
+        tax_ids_json = json.loads(taxids_map)
+    except Exception as e:
+        raise Exception(f"Failed to parse taxids map JSON: {str(e)}")
+
+    #taxranks arr
+    try:
+        taxa_ranks = taxranks.split(',')
+    except Exception as e:
+        raise Exception(f"Failed to parse taxranks string: {str(e)}")
+
+    #read shared columns once, per-sample reads as column arrays
+    sample_names = None
+    ranks = []
+    taxids = []
+    names = []
+    depths = []
+    sample_reads = []
+
+    with open(input_report, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            #header: #perc tot_all tot_lvl S1_all S1_lvl ... lvl_type taxid name
+            if line.startswith('#'):
+                if line.startswith('#perc'):
+                    header = line.rstrip('\n').split('\t')
+                    sample_cols = header[3:-3]
+                    if len(sample_cols) == 0 or len(sample_cols) % 2 != 0:
+                        raise Exception(f"Combined report has no per-sample read columns: {input_report}")
+                    sample_names = [re.sub(r'_all$', '', col) for col in sample_cols[0::2]]
+                    sample_reads = [[] for _ in sample_names]
+                continue
+
+            if sample_names is None:
+                #combine_bracken_outputs.py tables list species abundances only, no tree to build lineages from
+                if line.startswith('name\ttaxonomy_id\ttaxonomy_lvl'):
+                    raise Exception(f"Unsupported combine_bracken_outputs.py table: {input_report}. "
+                                    "Combine the per-sample Bracken reports (bracken -w) with combine_kreports.py instead")
+                raise Exception(f"Missing '#perc' header line in combined report: {input_report}")
+
+            fields = line.rstrip('\n').split('\t')
+            try:
+                clade_reads = [int(fields[3 + 2 * i]) for i in range(len(sample_names))]
+                taxon_rank = fields[-3].strip()
+                taxon_id = fields[-2].strip()
+                raw_name = fields[-1]
+            except (IndexError, ValueError) as e:
+                continue
+
+            #get depth based on indentation level
+            indent_match = re.match(r'^(\s*)', raw_name)
+            ranks.append(taxon_rank)
+            taxids.append(taxon_id)
+            names.append(raw_name.strip())
+            depths.append(len(indent_match.group(1)) // 2 if indent_match else 0)
+            for i, reads in enumerate(clade_reads):
+                sample_reads[i].append(reads)
+
+    if sample_names is None or len(names) == 0:
+        raise Exception(f"No taxonomy rows found in combined report: {input_report}")
+    print(f"Found {len(sample_names)} samples and {len(names)} taxa")
+
+    #reconstruct lineage once for the shared tree (rows are in depth-first order)
+    lineages = []
+    ancestors = []
+    for i in range(len(names)):
+        while ancestors and depths[ancestors[-1]] >= depths[i]:
+            ancestors.pop()
+
+        rank_values = {rank: "" for rank in taxa_ranks}
+        for j in ancestors + [i]:
+            if depths[j] > 0 and ranks[j] != '-' and ranks[j] in taxa_ranks:  #skip the root
+                rank_values[ranks[j]] = names[j]
+        lineages.append(rank_values)
+        ancestors.append(i)
+
+    #rows eligible for taxonomy table, independent of sample
+    taxonomy_rows = [i for i in range(len(names)) if depths[i] > 0 and ranks[i] != '-' and ranks[i] in taxa_ranks]
+    display_names = {}
+    for i in taxonomy_rows:
+        display_names[i] = f"{ranks[i].lower()}_{names[i]}" if ranks[i] != 'U' else names[i]
+
+    #taxids for summary
+    taxid_to_taxon = {}
+    for taxon, taxid in tax_ids_json.items():
+        if taxid != "NA":
+            if report_type == 'bracken':
+                if taxid != "0":
+                    taxid_to_taxon[taxid] = taxon
+            else:
+                taxid_to_taxon[taxid] = taxon
+    summary_rows = [(i, taxids[i]) for i in range(len(names)) if taxids[i] in taxid_to_taxon]
+    top_level_rows = [i for i in range(len(names)) if depths[i] == 0]
+
+    #sanitised ids must stay unique, e.g. S-1 and S.1 both become S_1
+    input_ids = {}
+    for sample_name in sample_names:
+        input_id = re.sub(r'[^a-zA-Z0-9_]', '_', sample_name)
+        if input_id in input_ids:
+            raise Exception(f"Duplicate sample id '{input_id}' from columns {input_ids[input_id]} and {sample_name}")
+        input_ids[input_id] = sample_name
+
+    os.makedirs(out_dir, exist_ok=True)
+    for input_id, reads in zip(input_ids, sample_reads):
+        sample_name = input_ids[input_id]
+
+        #per-sample percentage relative to its own total (unclassified + root)
+        total_reads = sum(reads[i] for i in top_level_rows)
+        if total_reads == 0:
+            print(f"Warning: sample {sample_name} has no reads, skipping")
+            continue
+        percentages = [round(r * 100 / total_reads, 2) for r in reads]
+
+        #sample summary
+        taxid_to_reads = {taxid: 0 for taxid in taxid_to_taxon}
+        for i, taxid in summary_rows:
+            taxid_to_reads[taxid] = reads[i]
+        summary_data = [{'taxid': taxid, 'taxon': taxid_to_taxon[taxid], 'cladeReads': r} for taxid, r in taxid_to_reads.items()]
+
+        #taxonomy data, skip taxa absent or below threshold in this sample
+        taxonomy_data = []
+        for i in taxonomy_rows:
+            if reads[i] == 0 or percentages[i] < min_percent_abundance:
+                continue
+
+            taxonomy_entry = {
+                'sample': input_id,
+                'percentage': percentages[i],
+                'cladeReads': reads[i],
+                'name': display_names[i],
+                'taxRank': ranks[i]
+            }
+            taxonomy_entry.update(lineages[i])
+            taxonomy_data.append(taxonomy_entry)
+
+        write_sample_summary(input_id, summary_data, os.path.join(out_dir, f"{input_id}_sample_summary.tsv"))
+        write_taxonomy_table(input_id, taxonomy_data, os.path.join(out_dir, f"{input_id}_taxonomy_table.tsv"), taxa_ranks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a multi-sample combined Kraken-like report (combine_kreports.py)")
+    parser.add_argument("--input_report", help="Input combined report file", required=True)
+    parser.add_argument("--report_type", help="Kraken or Bracken", required=True)
+    parser.add_argument("--taxids_map", help="Map of taxaids for sample summary", required=True)
+    parser.add_argument("--taxranks", help="Array of taxa ranks for taxonomy table", required=True)
+    parser.add_argument("--out_dir", help="Output directory for per-sample summary and taxonomy files", default=".")
+    parser.add_argument("--min_percent", help="Minimum percentage abundance to include", type=float, required=True)
+
+    args = parser.parse_args()
+
+    try:
+        processCombinedReport(args.input_report, args.report_type, args.taxids_map, args.taxranks, args.out_dir, args.min_percent)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,20 @@ import csv
 import re
 from pathlib import Path
 
+class ReportFormatError(Exception):
+    #input is not a kraken-like report at all (first line check)
+    pass
+
 def processReport(input_id, input_report, report_type, taxids_map, taxranks, out_summary, out_taxonomy, min_percent_abundance):
     print(f"Processing sample id: {input_id}")
+    summary_data, taxonomy_data, taxa_ranks = parseReport(input_id, lambda: open(input_report, 'r'), input_report, report_type, taxids_map, taxranks, min_percent_abundance)
+    
+    #write outputs
+    write_sample_summary(input_id, summary_data, out_summary)
+    write_taxonomy_table(input_id, taxonomy_data, out_taxonomy, taxa_ranks)
+
+def parseReport(input_id, open_report, input_report, report_type, taxids_map, taxranks, min_percent_abundance):
+    #open_report returns a fresh text stream of the report on each call (file or archive member)
     
     #taxids map
     try:
@@ -21,10 +33,10 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
         raise Exception(f"Failed to parse taxranks string: {str(e)}")
     
     #check the report (normal or with minimizer)
-    with open(input_report, 'r') as f:
+    with open_report() as f:
         first_line = next((line for line in f if line.strip()), None)
         if not first_line:
-            raise Exception(f"Empty report file: {input_report}")
+            raise ReportFormatError(f"Empty report file: {input_report}")
         
         fields = first_line.strip().split('\t')
         num_fields = len(fields)
@@ -44,7 +56,7 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
             taxid_col = 6
             name_col = 7
         else:
-            raise Exception(f"Unrecognized kraken2 report format (found {num_fields} columns)")
+            raise ReportFormatError(f"Unrecognized kraken2 report format (found {num_fields} columns)")
     
     #init data placeholder
     summary_data = []
@@ -71,7 +83,7 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
                 taxid_to_taxon[taxid] = taxon
     
     #proces line by line
-    with open(input_report, 'r') as f:
+    with open_report() as f:
         for line in f:
             if not line.strip():
                 continue
@@ -166,9 +178,7 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
             'cladeReads': reads
         })
 
-    #write outputs
-    write_sample_summary(input_id, summary_data, out_summary)
-    write_taxonomy_table(input_id, taxonomy_data, out_taxonomy, taxa_ranks)
+    return summary_data, taxonomy_data, taxa_ranks
 
 def write_sample_summary(input_id, summary_data, out_summary):
     with open(out_summary, 'w', newline='') as f:
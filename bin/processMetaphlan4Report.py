@@ -3,8 +3,20 @@ import argparse
 import json
 import csv
 
+class ReportFormatError(Exception):
+    #input is not a metaphlan4 profile at all (first data line check)
+    pass
+
 def processReport(input_id, input_report, report_type, taxids_map, taxranks, out_summary, out_taxonomy, min_percent_abundance):
     print(f"Processing sample id: {input_id}")
+    summary_data, taxonomy_data, taxa_ranks = parseReport(input_id, lambda: open(input_report, 'r'), input_report, report_type, taxids_map, taxranks, min_percent_abundance)
+    
+    #write outputs
+    write_sample_summary(input_id, summary_data, out_summary)
+    write_taxonomy_table(input_id, taxonomy_data, out_taxonomy, taxa_ranks)
+
+def parseReport(input_id, open_report, input_report, report_type, taxids_map, taxranks, min_percent_abundance):
+    #open_report returns a fresh text stream of the report on each call (file or archive member)
     
     #taxids map
     try:
@@ -19,15 +31,15 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
         raise Exception(f"Failed to parse taxranks string: {str(e)}")
     
     #validate metaphlan4 format
-    with open(input_report, 'r') as f:
+    with open_report() as f:
         for line in f:
             if line.strip() and not line.startswith('#'):
                 fields = line.strip().split('\t')
                 if len(fields) != 5:
-                    raise Exception(f"Invalid Metaphlan4 format: expected 5 columns, got {len(fields)}")
+                    raise ReportFormatError(f"Invalid Metaphlan4 format: expected 5 columns, got {len(fields)}")
                 break
         else:
-            raise Exception(f"No valid data lines found in {input_report}")
+            raise ReportFormatError(f"No valid data lines found in {input_report}")
     
     #init data
     summary_data = []
@@ -52,7 +64,7 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
     }
     
     #process metaphlan4 report
-    with open(input_report, 'r') as f:
+    with open_report() as f:
         for line in f:
             if line.startswith('#') or not line.strip():
                 continue
@@ -129,9 +141,7 @@ def processReport(input_id, input_report, report_type, taxids_map, taxranks, out
                 'cladeReads': reads
             })
 
-    #write outputs
-    write_sample_summary(input_id, summary_data, out_summary)
-    write_taxonomy_table(input_id, taxonomy_tree, out_taxonomy, taxa_ranks)
+    return summary_data, taxonomy_tree, taxa_ranks
 
 def write_sample_summary(input_id, summary_data, out_summary):
     with open(out_summary, 'w', newline='') as f:
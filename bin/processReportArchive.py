@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import argparse
+import fnmatch
+import io
+import os
+import re
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import processKrakenBrackenReport
+import processMetaphlan4Report
+
+PARSERS = {
+    'kraken2': processKrakenBrackenReport,
+    'bracken': processKrakenBrackenReport,
+    'metaphlan4': processMetaphlan4Report
+}
+
+def member_is_hidden(member_name):
+    #dot files and macOS metadata (._*, .DS_Store, __MACOSX/) are never reports
+    parts = member_name.split('/')
+    return '__MACOSX' in parts or any(part.startswith('.') and part not in ('.', '..') for part in parts)
+
+def member_matches(member_name, member_glob):
+    if member_is_hidden(member_name):
+        return False
+    return fnmatch.fnmatch(member_name, member_glob) or fnmatch.fnmatch(os.path.basename(member_name), member_glob)
+
+def member_sample_id(member_name):
+    #same as the nextflow channel: file name without last extension, sanitised
+    base_name = os.path.splitext(os.path.basename(member_name))[0]
+    return re.sub(r'[^a-zA-Z0-9_]', '_', base_name)
+
+def iter_archive_members(input_archive, member_glob):
+    #single streaming pass, members are read into memory and never extracted to disk
+    if zipfile.is_zipfile(input_archive):
+        with zipfile.ZipFile(input_archive) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and member_matches(info.filename, member_glob):
+                    yield info.filename, archive.read(info)
+    else:
+        with tarfile.open(input_archive, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile() and member_matches(member.name, member_glob):
+                    yield member.name, archive.extractfile(member).read()
+
+def parse_member(input_id, member_name, content, report_type, taxids_map, taxranks, out_dir, min_percent_abundance):
+    parser = PARSERS[report_type]
+    text = content.decode('utf-8')
+    summary_data, taxonomy_data, taxa_ranks = parser.parseReport(input_id, lambda: io.StringIO(text), member_name, report_type, taxids_map, taxranks, min_percent_abundance)
+    parser.write_sample_summary(input_id, summary_data, os.path.join(out_dir, f"{input_id}_sample_summary.tsv"))
+    parser.write_taxonomy_table(input_id, taxonomy_data, os.path.join(out_dir, f"{input_id}_taxonomy_table.tsv"), taxa_ranks)
+    return input_id
+
+def processArchive(input_archive, member_glob, report_type, taxids_map, taxranks, out_dir, min_percent_abundance, threads):
+    print(f"Processing archive: {input_archive} (members matching '{member_glob}')")
+    if report_type not in PARSERS:
+        raise Exception(f"Unsupported report type for archives: {report_type}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    pending = {}
+    processed = {}
+
+    def collect(futures):
+        for future in futures:
+            input_id, member_name = pending.pop(future)
+            try:
+                future.result()
+            except PARSERS[report_type].ReportFormatError as e:
+                #with the default glob, members that are not reports at all (READMEs, sample lists...) are skipped,
+                #members selected by an explicit glob and any other error fail the run like a plain report would
+                if member_glob != '*':
+                    raise Exception(f"Member {member_name}: {str(e)}")
+                print(f"Warning: skipping member {member_name}, not a {report_type} report ({str(e)})")
+                continue
+            except Exception as e:
+                raise Exception(f"Member {member_name}: {str(e)}")
+            if input_id in processed:
+                raise Exception(f"Duplicate sample id '{input_id}' from members {processed[input_id]} and {member_name}")
+            processed[input_id] = member_name
+
+    with ProcessPoolExecutor(max_workers=threads) as executor:
+        for member_name, content in iter_archive_members(input_archive, member_glob):
+            input_id = member_sample_id(member_name)
+
+            #bound the number of members held in memory
+            if len(pending) >= threads * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            print(f"Processing sample id: {input_id} ({member_name})")
+            pending[executor.submit(parse_member, input_id, member_name, content, report_type, taxids_map, taxranks, out_dir, min_percent_abundance)] = (input_id, member_name)
+
+        collect(list(pending))
+
+    if len(processed) == 0:
+        raise Exception(f"No {report_type} reports matching '{member_glob}' found in {input_archive}")
+    print(f"Processed {len(processed)} reports from {input_archive}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Process reports streamed from a tar/zip archive")
+    parser.add_argument("--input_archive", help="Input tar(.gz/.bz2/.xz) or zip archive", required=True)
+    parser.add_argument("--member_glob", help="Glob selecting report members inside the archive", default="*")
+    parser.add_argument("--report_type", help="kraken2, bracken or metaphlan4", required=True)
+    parser.add_argument("--taxids_map", help="Map of taxaids for sample summary", required=True)
+    parser.add_argument("--taxranks", help="Array of taxa ranks for taxonomy table", required=True)
+    parser.add_argument("--out_dir", help="Output directory for per-sample summary and taxonomy files", default=".")
+    parser.add_argument("--min_percent", help="Minimum percentage abundance to include", type=float, required=True)
+    parser.add_argument("--threads", help="Number of parallel parse workers", type=int, default=1)
+
+    args = parser.parse_args()
+
+    try:
+        processArchive(args.input_archive, args.member_glob, args.report_type, args.taxids_map, args.taxranks, args.out_dir, args.min_percent, max(1, args.threads))
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
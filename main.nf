@@ -10,6 +10,13 @@ params.taxrank_list = null
 params.pipeline_version = null
 params.min_percent_abundance = null
 params.executor = null
+params.sqlite = false
+params.search_index = false
+params.taxonomy_tree = false
+params.compile_chunk_size = 100
+params.archive_glob = '*'
+params.from_archives = false
+params.archive_threads = 4
 
 //validation, key requeirements
 if (params.reports == null) {
@@ -38,23 +45,41 @@ workflow {
             tuple(id, report)
         }
 
-    //parse input reports
-    if (params.report_type == 'kraken2' || params.report_type == 'bracken') {
+    //parse input reports, archives (detected by the metaxsfr preflight) are streamed by one task per archive
+    if (params.from_archives) {
+        ch_parsed_reports = PROCESSING_REPORT_ARCHIVES(ch_reports)
+    }
+    else if (params.report_type == 'kraken2' || params.report_type == 'bracken') {
         ch_parsed_reports = PROCESSING_KRAKENLIKE_REPORTS(ch_reports)
     }
     else if (params.report_type == 'metaphlan4') {
         ch_parsed_reports = PROCESSING_METAPHLAN4_REPORTS(ch_reports)
     }
+    else if (params.report_type == 'kraken2-combined' || params.report_type == 'bracken-combined') {
+        ch_parsed_reports = PROCESSING_COMBINED_KREPORTS(ch_reports)
+    }
+
+    //compile parsed reports in chunks as they arrive, then merge the partial tables
+    ch_summary_chunks = ch_parsed_reports.sample_summary
+        .flatten()
+        .collate(params.compile_chunk_size as int)
+        .map { files -> tuple(files[0].baseName.replaceAll(/_sample_summary$/, ''), files) }
+    ch_taxonomy_chunks = ch_parsed_reports.taxonomy_table
+        .flatten()
+        .collate(params.compile_chunk_size as int)
+        .map { files -> tuple(files[0].baseName.replaceAll(/_taxonomy_table$/, ''), files) }
+
+    ch_partial_summaries = COMPILING_SUMMARY_CHUNKS(ch_summary_chunks)
+    ch_partial_taxonomies = COMPILING_TAXONOMY_CHUNKS(ch_taxonomy_chunks)
 
-    //compile parsed reports
-    ch_compiled_summary = COMPILING_SUMMARIES(ch_parsed_reports.sample_summary.collect())
-    ch_compiled_taxonomy = COMPILING_TAXONOMIES(ch_parsed_reports.taxonomy_table.collect())
+    ch_compiled_summary = COMPILING_SUMMARIES(ch_partial_summaries.collect(sort: { it.name }))
+    ch_compiled_taxonomy = COMPILING_TAXONOMIES(ch_partial_taxonomies.collect(sort: { it.name }))
 
     //generate final report
     template_file = file("${baseDir}/bin/metaxsfr_template.html")
     scifr_output = GENERATING_REPORT(
         ch_compiled_summary, 
-        ch_compiled_taxonomy,
+        ch_compiled_taxonomy.sample_taxonomy_tsv,
         template_file
     )
     //validate final report
@@ -113,19 +138,101 @@ process PROCESSING_METAPHLAN4_REPORTS {
     """
 }
 
+process PROCESSING_COMBINED_KREPORTS {
+    tag "${id}"
+    publishDir "${params.results_directory}/ParsedReports", mode: 'copy'
+    
+    input:
+    tuple val(id), path(report)
+    
+    output:
+    path("*_sample_summary.tsv"), emit: sample_summary
+    path("*_taxonomy_table.tsv"), emit: taxonomy_table
+    
+    script:
+    def report_type = params.report_type == 'bracken-combined' ? 'bracken' : 'kraken2'
+    """
+    processCombinedKreport.py \\
+        --input_report ${report} \\
+        --report_type '${report_type}' \\
+        --taxids_map '${params.taxid_map}' \\
+        --taxranks '${params.taxrank_list}' \\
+        --out_dir . \\
+        --min_percent ${params.min_percent_abundance}
+    """
+}
+
+process PROCESSING_REPORT_ARCHIVES {
+    tag "${id}"
+    cpus params.archive_threads
+    publishDir "${params.results_directory}/ParsedReports", mode: 'copy'
+    
+    input:
+    tuple val(id), path(archive)
+    
+    output:
+    path("*_sample_summary.tsv"), emit: sample_summary
+    path("*_taxonomy_table.tsv"), emit: taxonomy_table
+    
+    script:
+    """
+    processReportArchive.py \\
+        --input_archive ${archive} \\
+        --member_glob '${params.archive_glob}' \\
+        --report_type '${params.report_type}' \\
+        --taxids_map '${params.taxid_map}' \\
+        --taxranks '${params.taxrank_list}' \\
+        --out_dir . \\
+        --min_percent ${params.min_percent_abundance} \\
+        --threads ${task.cpus}
+    """
+}
+
+process COMPILING_SUMMARY_CHUNKS {
+    tag "${chunk_id}"
+
+    input:
+    tuple val(chunk_id), path(summaries)
+
+    output:
+    path("${chunk_id}.summaryTable.tsv"), emit: partial_summary_tsv
+
+    script:
+    def summary_files = summaries.collect { it.toString() }.join(' ')
+    """
+    compileSampleSummaries.py --out "${chunk_id}.summaryTable.tsv" ${summary_files}
+    """
+}
+
+process COMPILING_TAXONOMY_CHUNKS {
+    tag "${chunk_id}"
+
+    input:
+    tuple val(chunk_id), path(taxonomies)
+
+    output:
+    path("${chunk_id}.taxonomyTable.tsv"), emit: partial_taxonomy_tsv
+
+    script:
+    def taxonomy_files = taxonomies.collect { "\"$it\"" }.join(' ')
+    """
+    compileTaxonomyTables.py --out "${chunk_id}.taxonomyTable.tsv" ${taxonomy_files}
+    """
+}
+
 process COMPILING_SUMMARIES {
     publishDir "${params.results_directory}/TemplateInputs", mode: 'copy'
 
     input:
-    path summaries
+    path partial_summaries
 
     output:
     path("summaryTable.tsv"), emit: sample_summary_tsv
 
     script:
-    def summary_files = summaries.collect { it.toString() }.join(' ')
+    def summary_files = partial_summaries.collect { it.toString() }.join(' ')
     """
-    compileSampleSummaries.py --out "summaryTable.tsv" ${summary_files}
+    compileSampleSummaries.py --merge --out "summaryTable.tsv" ${summary_files}
     """
 }
 
@@ -133,18 +240,18 @@ process COMPILING_TAXONOMIES {
     publishDir "${params.results_directory}/TemplateInputs", mode: 'copy'
     
     input:
-    path taxonomies
+    path partial_taxonomies
     
     output:
     path("taxonomyTable.tsv"), emit: sample_taxonomy_tsv
+    path("taxonomyTree.json"), optional: true, emit: taxonomy_tree_json
     
     script:
-    def taxonomy_files = taxonomies.collect { "\"$it\"" }.join(' ')
+    def taxonomy_files = partial_taxonomies.collect { "\"$it\"" }.join(' ')
+    def build_tree = params.taxonomy_tree ? 'compileTaxonomyTree.py --taxonomy_table taxonomyTable.tsv --out taxonomyTree.json' : ''
     """
-    #!/bin/bash
-    echo ${taxonomy_files} | tr ' ' '\\n' > taxonomy_file_list.txt
-    head -n 1 \$(head -n 1 taxonomy_file_list.txt) > taxonomyTable.tsv
-    while read file; do tail -n +2 "\$file" >> taxonomyTable.tsv ; done < taxonomy_file_list.txt
+    compileTaxonomyTables.py --out "taxonomyTable.tsv" ${taxonomy_files}
+    ${build_tree}
     """
 }
 
@@ -159,8 +266,12 @@ process GENERATING_REPORT {
     output:
     path ("metaxsfr.json"), optional: true, emit: scifr_input_json
     path ("metaxsfr.html"), emit: scifr_report
+    path ("metaxsfr.sqlite"), optional: true, emit: query_database
+    path ("taxonSearchIndex.json"), optional: true, emit: taxon_search_index
 
     script:
+    def sqlite_arg = params.sqlite ? '--out_sqlite "metaxsfr.sqlite"' : ''
+    def search_index_arg = params.search_index ? '--out_search_index "taxonSearchIndex.json"' : ''
     """
     echo '${groovy.json.JsonOutput.toJson(params)}' > params.json
     generateMetaxsfr.py \\
@@ -170,7 +281,8 @@ process GENERATING_REPORT {
         --out_html "metaxsfr.html" \\
         --out_json "metaxsfr.json" \\
         --params_data params.json \\
-        --pipeline_version "${params.pipeline_version}"
+        --pipeline_version "${params.pipeline_version}" \\
+        ${sqlite_arg} ${search_index_arg}
     """
 }
 
@@ -5,13 +5,28 @@ import os
 import subprocess
 import sys
 import glob
+import math
+import sqlite3
+import tarfile
+import zipfile
+import fnmatch
+import csv
+import datetime
+import functools
+import bisect
+import ipaddress
+import socket
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from pathlib import Path
 
 #const
 TAXRANK_NCBI = ["D", "K", "P", "C", "O", "F", "G", "S"]
 TAXRANK_GTDB = ["R1", "P", "C", "O", "F", "G", "S"]
-SUPPORTED_REPORT_TYPES = ['kraken2', 'bracken', 'metaphlan4']
+SUPPORTED_REPORT_TYPES = ['kraken2', 'bracken', 'metaphlan4', 'kraken2-combined', 'bracken-combined']
 SUPPORTED_DATABASES = ['ncbi', 'gtdb']
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+ARCHIVE_REPORT_TYPES = ['kraken2', 'bracken', 'metaphlan4']
 TAXID_NCBI = {
     "unclassified": "0",
     "human": "9606",
@@ -29,6 +44,14 @@ TAXID_GTDB = {
     "archaeal": "2"
 }
 
+#per-process memory model (memory_mb = base_mb + mb_per_unit * units, units from the report stats named in 'scale'),
+#fitted on peak RSS over the sample/ reports by benchmark/fit_resource_model.py, rerun it when a stage changes
+RESOURCE_MODEL_PATH = os.path.join("benchmark", "resource_model.json")
+RESOURCE_SAFETY_FACTOR = 1.5
+RESOURCE_MIN_MEMORY_MB = 512
+RESOURCE_MAX_RETRIES = 2
+RESOURCE_CONFIG_NAME = "metaxsfr.resources.config"
+
 def validate_inputs(reports, report_type, report_db):
     if report_type not in SUPPORTED_REPORT_TYPES:
         sys.exit(f"Error: Report type must be one of {SUPPORTED_REPORT_TYPES}, got '{report_type}'")
@@ -84,6 +107,175 @@ def transform_reports_for_nextflow(reports):
     else:
         return reports
     
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def validate_archives(reports, report_type):
+    report_files = expand_report_files(reports)
+    archives = [f for f in report_files if is_archive(f)]
+    if not archives:
+        return False
+    
+    if len(archives) != len(report_files):
+        sys.exit("Error: Archives and plain report files cannot be mixed in --reports")
+    if report_type not in ARCHIVE_REPORT_TYPES:
+        sys.exit(f"Error: Report type for archives must be one of {ARCHIVE_REPORT_TYPES}, got '{report_type}'")
+    for f in archives:
+        if not (zipfile.is_zipfile(f) or tarfile.is_tarfile(f)):
+            sys.exit(f"Error: Cannot read archive '{f}'")
+    print(f"+++ Reading reports from {len(archives)} archive(s)")
+    return True
+
+def archive_member_matches(member_name, archive_glob):
+    #dot files and macOS metadata (._*, .DS_Store, __MACOSX/) are never reports, same as processReportArchive.py
+    parts = member_name.split('/')
+    if '__MACOSX' in parts or any(part.startswith('.') and part not in ('.', '..') for part in parts):
+        return False
+    return fnmatch.fnmatch(member_name, archive_glob) or fnmatch.fnmatch(os.path.basename(member_name), archive_glob)
+
+def expand_report_files(reports):
+    #resolve reports argument to a list of files, same rules as validate_inputs
+    patterns = [f.strip().strip('"\'') for f in reports.split(',')]
+    report_files = []
+    for f in patterns:
+        if '*' in f or '?' in f or '[' in f:
+            report_files.extend(sorted(glob.glob(f)))
+        else:
+            report_files.append(f)
+    return report_files
+
+def count_rows(f):
+    rows = 0
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+        rows += chunk.count(b'\n')
+    return rows
+
+def count_combined_samples(report_file):
+    #combine_kreports.py header: #perc tot_all tot_lvl S1_all S1_lvl ... lvl_type taxid name
+    with open(report_file, 'r') as f:
+        for line in f:
+            if line.startswith('#perc'):
+                return max(1, len(line.rstrip('\n').split('\t')[3:-3]) // 2)
+            if line.strip() and not line.startswith('#'):
+                break
+    return 1
+
+def iter_report_sizes(reports, report_type, archive_glob):
+    #(bytes, rows, samples) per report, archive members are streamed without extraction (one sample each)
+    for report_file in expand_report_files(reports):
+        if not is_archive(report_file):
+            #a combined report holds one column per sample, each split into its own report downstream
+            samples = count_combined_samples(report_file) if report_type.endswith('-combined') else 1
+            with open(report_file, 'rb') as f:
+                yield os.path.getsize(report_file), count_rows(f), samples
+        elif zipfile.is_zipfile(report_file):
+            with zipfile.ZipFile(report_file) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and archive_member_matches(info.filename, archive_glob):
+                        with archive.open(info) as f:
+                            yield info.file_size, count_rows(f), 1
+        else:
+            with tarfile.open(report_file, mode='r|*') as archive:
+                for member in archive:
+                    if member.isfile() and archive_member_matches(member.name, archive_glob):
+                        yield member.size, count_rows(archive.extractfile(member)), 1
+
+def collect_report_stats(reports, report_type, compile_chunk_size, archive_glob='*'):
+    #num_reports counts samples: archive members and the sample columns of combined reports
+    num_reports = 0
+    total_bytes = 0
+    total_rows = 0
+    max_rows = 0
+    for size, rows, samples in iter_report_sizes(reports, report_type, archive_glob):
+        num_reports += samples
+        total_bytes += size
+        total_rows += rows
+        max_rows = max(max_rows, rows)
+    
+    if num_reports == 0:
+        sys.exit(f"Error: No reports found (archive members must match '{archive_glob}')")
+    
+    return {
+        "num_reports": num_reports,
+        "chunk_reports": min(num_reports, compile_chunk_size),
+        "total_mb": total_bytes / (1024 * 1024),
+        "total_rows": total_rows,
+        "max_rows": max_rows
+    }
+
+def load_resource_model():
+    script_dir = os.path.dirname(os.path.realpath(os.path.abspath(__file__)))
+    model_path = os.path.join(script_dir, RESOURCE_MODEL_PATH)
+    try:
+        with open(model_path, 'r') as f:
+            return json.load(f)["processes"]
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"Error: Cannot load resource model {model_path} ({e}), rerun with --no-resource-estimate")
+
+def get_host_limits():
+    try:
+        memory_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        memory_mb = None
+    return {"cpus": os.cpu_count() or 1, "memory_mb": memory_mb}
+
+def estimate_resources(stats, process_cpus, host_limits=None):
+    #process_cpus: cpus per process (default 1), each parse worker of a 'per_cpu' model holds one report
+    estimates = {}
+    for process_name, model in load_resource_model().items():
+        cpus = process_cpus.get(process_name, 1)
+        if host_limits:
+            cpus = min(cpus, host_limits["cpus"])
+        
+        memory_mb = model["base_mb"] + model["mb_per_unit"] * stats[model["scale"]]
+        if model.get("per_cpu"):
+            #one report per worker plus the reader holding pending members
+            memory_mb *= cpus + 1
+        memory_mb = max(RESOURCE_MIN_MEMORY_MB, int(math.ceil(memory_mb * RESOURCE_SAFETY_FACTOR)))
+        
+        max_memory_mb = host_limits["memory_mb"] if host_limits else None
+        if max_memory_mb:
+            if memory_mb > max_memory_mb:
+                print(f"Warning: {process_name} is estimated to need {memory_mb} MB, capped to host memory ({max_memory_mb} MB)")
+            memory_mb = min(memory_mb, max_memory_mb)
+        
+        estimates[process_name] = {
+            "cpus": cpus,
+            "memory_mb": memory_mb,
+            "max_memory_mb": max_memory_mb
+        }
+    return estimates
+
+def write_resource_config(estimates, stats, output, version):
+    os.makedirs(output, exist_ok=True)
+    config_path = os.path.join(output, RESOURCE_CONFIG_NAME)
+    
+    lines = [
+        f"// generated by metaxsfr v{version} from {stats['num_reports']} reports "
+        f"({stats['total_mb']:.2f} MB, {stats['total_rows']} rows)",
+        "process {",
+        "    //retry with more memory when killed for exceeding it",
+        "    //(137 = SIGKILL e.g. by the OOM killer, 140 = SIGUSR2 sent by some schedulers on exceeding limits)",
+        "    errorStrategy = { task.exitStatus in [137, 140] ? 'retry' : 'terminate' }",
+        f"    maxRetries = {RESOURCE_MAX_RETRIES}",
+    ]
+    for process_name, estimate in estimates.items():
+        memory = f"{estimate['memory_mb']}.MB * task.attempt"
+        if estimate['max_memory_mb']:
+            #retries never ask for more than the host has
+            memory = f"[{memory}, {estimate['max_memory_mb']}.MB].min()"
+        lines.extend([
+            f"    withName: '{process_name}' {{",
+            f"        cpus = {estimate['cpus']}",
+            f"        memory = {{ {memory} }}",
+            "    }"
+        ])
+    lines.append("}")
+    
+    with open(config_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return config_path
+
 def get_taxid_map(report_db):
     if report_db == 'ncbi':
         return TAXID_NCBI
@@ -117,18 +309,40 @@ def find_main_nf():
     sys.exit("Error: Cannot find main.nf. Please ensure METAXSFR is correctly installed.")
 
 def run_metaxsfr_pipeline(reports, report_type, report_db, output, 
-                         min_abundance, executor, resume, config, nf_args, version):
+                         min_abundance, executor, resume, config, nf_args, version,
+                         estimate_resources_enabled=True, sqlite=False, taxonomy_tree=False,
+                         compile_chunk_size=100, archive_glob='*', archive_threads=4, search_index=False):
     
     print(f"+++ Starting METAXSFR v{version}")
     
     #preflight
     validate_inputs(reports, report_type, report_db)
+    from_archives = validate_archives(reports, report_type)
+    if compile_chunk_size < 1:
+        sys.exit(f"Error: Compile chunk size must be at least 1, got {compile_chunk_size}")
+    if archive_threads < 1:
+        sys.exit(f"Error: Archive threads must be at least 1, got {archive_threads}")
+    if executor == 'local':
+        archive_threads = min(archive_threads, os.cpu_count() or 1)
     transformed_reports = transform_reports_for_nextflow(reports)
     taxid_map = get_taxid_map(report_db)
     taxrank_list = get_taxrank_list(report_db)
     main_nf_path = find_main_nf()
     print(f"+++ Using workflow: {main_nf_path}")
     
+    #estimate per-process resources from report sizes
+    resource_config = None
+    if estimate_resources_enabled:
+        stats = collect_report_stats(reports, report_type, compile_chunk_size, archive_glob)
+        #a local run cannot use more than this machine has
+        host_limits = get_host_limits() if executor == 'local' else None
+        estimates = estimate_resources(stats, {"PROCESSING_REPORT_ARCHIVES": archive_threads}, host_limits)
+        resource_config = write_resource_config(estimates, stats, output, version)
+        print(f"+++ Estimated resources from {stats['num_reports']} reports "
+              f"({stats['total_mb']:.2f} MB, {stats['total_rows']} rows): {resource_config}")
+        for process_name, estimate in estimates.items():
+            print(f"    {process_name}: {estimate['cpus']} cpus, {estimate['memory_mb']} MB")
+    
     #build nf command
     nextflow_cmd = ["nextflow", "run", main_nf_path]
     nextflow_cmd.extend([
@@ -140,15 +354,26 @@ def run_metaxsfr_pipeline(reports, report_type, report_db, output,
         f"--taxrank_list={','.join(taxrank_list)}",
         f"--min_percent_abundance={min_abundance}",
         f"--executor={executor}",
-        f"--pipeline_version={version}"
+        f"--pipeline_version={version}",
+        f"--sqlite={str(sqlite).lower()}",
+        f"--taxonomy_tree={str(taxonomy_tree).lower()}",
+        f"--search_index={str(search_index).lower()}",
+        f"--compile_chunk_size={compile_chunk_size}",
+        f"--archive_glob={archive_glob}",
+        f"--archive_threads={archive_threads}",
+        f"--from_archives={str(from_archives).lower()}"
     ])
     
     #add nf options
     if resume:
         nextflow_cmd.append("-resume")
     
+    #user config goes last so it overrides the estimates
+    if resource_config:
+        nextflow_cmd.extend(["-c", resource_config])
+    
     if config:
-        nextflow_cmd.append(f"-c {config}")
+        nextflow_cmd.extend(["-c", config])
     
     if nf_args:
         nextflow_cmd.append(nf_args)
@@ -164,11 +389,358 @@ def run_metaxsfr_pipeline(reports, report_type, report_db, output,
         print("\n+++ METAXSFR execution interrupted by user")
         sys.exit(1)
 
+def run_query(database, taxon=None, sample=None, rank=None, min_percent=0.0, top=None, list_samples=False, lineage=None):
+    if not os.path.exists(database):
+        sys.exit(f"Error: Query database '{database}' does not exist")
+    
+    conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        #samples in the database
+        if list_samples:
+            header = ['sample']
+            rows = conn.execute("SELECT name FROM samples ORDER BY name").fetchall()
+        
+        #taxa/samples matching the filters above threshold
+        elif taxon or sample or lineage:
+            header = ['sample', 'name', 'taxRank', 'percentage', 'cladeReads', 'lineage']
+            sql = ("SELECT s.name, t.name, t.rank, a.percentage, a.cladeReads, t.lineage "
+                   "FROM taxa t JOIN abundance a ON a.taxon_id = t.taxon_id JOIN samples s ON s.sample_id = a.sample_id "
+                   "WHERE a.percentage >= ?")
+            values = [min_percent]
+            if taxon:
+                #bare name or rank-prefixed label, e.g. Escherichia or g_Escherichia
+                sql += " AND (t.name = ? COLLATE NOCASE OR t.label = ? COLLATE NOCASE)"
+                values.extend([taxon, taxon])
+            if lineage:
+                #whole rank values only (Bacillota must not match Bacillota_A), as ranges so the lineage index is used:
+                #the lineage itself or anything below it, i.e. starting with 'prefix|' ('}' sorts right after '|')
+                lineage = lineage.rstrip('|')
+                sql += " AND (t.lineage = ? OR (t.lineage >= ? AND t.lineage < ?))"
+                values.extend([lineage, lineage + '|', lineage + '}'])
+            if sample:
+                sql += " AND s.name = ?"
+                values.append(sample)
+            if rank:
+                sql += " AND t.rank = ?"
+                values.append(rank)
+            sql += " ORDER BY a.percentage DESC"
+            if top:
+                sql += " LIMIT ?"
+                values.append(top)
+            rows = conn.execute(sql, values).fetchall()
+        
+        else:
+            sys.exit("Error: One of --taxon, --sample, --lineage or --list-samples is required")
+    finally:
+        conn.close()
+    
+    print('\t'.join(header))
+    for row in rows:
+        print('\t'.join('' if v is None else str(v) for v in row))
+
+def query_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="metaxsfr query",
+        description="Query the metaxsfr.sqlite database written with --sqlite",
+        epilog="Example: metaxsfr query results/FinalReport/metaxsfr.sqlite --taxon Escherichia --rank G --min-percent 1",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("database", help="Path to metaxsfr.sqlite")
+    parser.add_argument("--taxon", default=None,
+                       help="List samples containing this taxon, by name or rank-prefixed label, e.g. Escherichia or g_Escherichia (case-insensitive)")
+    parser.add_argument("--sample", default=None,
+                       help="List taxa found in this sample")
+    parser.add_argument("--lineage", default=None,
+                       help="Restrict to taxa under this lineage: whole rank values joined by '|' from the highest rank, "
+                            "empty ranks included, e.g. 'Bacteria|Bacillota' (does not match Bacillota_A)")
+    parser.add_argument("--list-samples", action="store_true",
+                       help="List all samples in the database")
+    parser.add_argument("--rank", default=None,
+                       help="Restrict to taxonomic rank, e.g. G or S")
+    parser.add_argument("--min-percent", type=float, default=0.0,
+                       help="Minimum percentage abundance")
+    parser.add_argument("--top", type=int, default=None,
+                       help="Only report the top N rows")
+    
+    args = parser.parse_args(argv)
+    run_query(args.database, args.taxon, args.sample, args.rank, args.min_percent, args.top, args.list_samples, args.lineage)
+
+def find_template():
+    script_dir = os.path.dirname(os.path.realpath(os.path.abspath(__file__)))
+    template_path = os.path.join(script_dir, 'bin', 'metaxsfr_template.html')
+    if not os.path.exists(template_path):
+        sys.exit("Error: Cannot find bin/metaxsfr_template.html. Please ensure METAXSFR is correctly installed.")
+    return template_path
+
+def read_tsv_rows(file_path):
+    with open(file_path, 'r', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader, [])
+        return header, [row for row in reader if row]
+
+def rows_to_flat_string(header, rows):
+    #same encoding as generateMetaxsfr.convert_tsv_to_flat_string
+    lines = ['\t'.join(header)] + ['\t'.join(row) for row in rows]
+    return ';n'.join(lines).replace('\t', ';t') + ';n'
+
+class ReportData:
+    def __init__(self, results_directory, cache_size):
+        self.parsed_dir = os.path.join(results_directory, 'ParsedReports')
+        self.summary_table = os.path.join(results_directory, 'TemplateInputs', 'summaryTable.tsv')
+        self.taxonomy_table = os.path.join(results_directory, 'TemplateInputs', 'taxonomyTable.tsv')
+        self.search_index = os.path.join(results_directory, 'FinalReport', 'taxonSearchIndex.json')
+        if not os.path.isdir(self.parsed_dir):
+            sys.exit(f"Error: '{self.parsed_dir}' not found, point serve at a METAXSFR results directory")
+        
+        #sample ids from per-sample outputs, tables are only read on request
+        suffix = '_taxonomy_table.tsv'
+        self.samples = sorted(f[:-len(suffix)] for f in os.listdir(self.parsed_dir) if f.endswith(suffix))
+        self.sample_set = set(self.samples)
+        self.load_taxonomy = functools.lru_cache(maxsize=cache_size)(self._load_taxonomy)
+    
+    def _load_taxonomy(self, sample):
+        return read_tsv_rows(os.path.join(self.parsed_dir, f"{sample}_taxonomy_table.tsv"))
+    
+    @functools.lru_cache(maxsize=1)
+    def load_summary(self):
+        if os.path.exists(self.summary_table):
+            return read_tsv_rows(self.summary_table)
+        return [], []
+    
+    def summary_slice(self, samples):
+        header, rows = self.load_summary()
+        selected = set(samples)
+        return header, [row for row in rows if row[0] in selected]
+    
+    def taxonomy_slice(self, samples, rank=None):
+        header = []
+        rows = []
+        for sample in samples:
+            if sample not in self.sample_set:
+                continue
+            header, sample_rows = self.load_taxonomy(sample)
+            if rank and 'taxRank' in header:
+                rank_idx = header.index('taxRank')
+                sample_rows = [row for row in sample_rows if row[rank_idx] == rank]
+            rows.extend(sample_rows)
+        return header, rows
+    
+    @functools.lru_cache(maxsize=1)
+    def load_search_index(self):
+        #prebuilt with --search-index, otherwise built once with the same builder (bin/ is on sys.path, see make_request_handler)
+        if os.path.exists(self.search_index):
+            with open(self.search_index, 'r') as f:
+                return json.load(f)
+        
+        from generateMetaxsfr import build_taxon_search_index
+        if os.path.exists(self.taxonomy_table):
+            with open(self.taxonomy_table, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='\t')
+                return build_taxon_search_index(next(reader), reader)
+        
+        #no compiled table: per-sample tables, read once outside the LRU cache
+        header = ['sample', 'name', 'taxRank']
+        rows = []
+        for sample in self.samples:
+            header, sample_rows = self._load_taxonomy(sample)
+            rows.extend(sample_rows)
+        return build_taxon_search_index(header, rows)
+    
+    def search_taxa(self, query, rank=None, limit=50):
+        #names starting with the query (rank prefix dropped, case-insensitive): prefix range, then binary search
+        index = self.load_search_index()
+        keys = index['keys']
+        query = query.strip().lower()
+        start, end = 0, len(keys)
+        if len(query) >= index['prefixLength']:
+            start, end = index['prefixRanges'].get(query[:index['prefixLength']], (0, 0))
+        
+        results = []
+        i = bisect.bisect_left(keys, query, start, end)
+        while i < end and keys[i].startswith(query) and len(results) < limit:
+            if not rank or index['ranks'][i] == rank:
+                results.append({
+                    "name": index['names'][i],
+                    "taxRank": index['ranks'][i],
+                    "samples": [index['sampleIds'][j] for j in index['samples'][i]]
+                })
+            i += 1
+        return results
+
+def to_json_number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return value
+
+def taxonomy_records(header, rows):
+    numeric = {'percentage': float, 'cladeReads': int}
+    casts = [numeric.get(column) for column in header]
+    return [{column: to_json_number(value, cast) if cast else value for column, cast, value in zip(header, casts, row)} for row in rows]
+
+def summary_records(header, rows):
+    #read counts per summary taxon, keyed by sample id
+    return [{column: to_json_number(value, int) if i > 0 else value for i, (column, value) in enumerate(zip(header, row))} for row in rows]
+
+def make_request_handler(data, template_content, initial_samples):
+    #reuse the report mutator and the tree builder from bin/
+    sys.path.insert(0, os.path.dirname(find_template()))
+    from scifrMutator import find_and_replace_json_block
+    from compileTaxonomyTree import build_taxonomy_tree
+    
+    class MetaxsfrRequestHandler(BaseHTTPRequestHandler):
+        def send_body(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def send_json(self, payload, status=200):
+            self.send_body(json.dumps(payload).encode('utf-8'), 'application/json', status)
+        
+        def requested_samples(self, query):
+            #unknown ids are dropped, so the page and the API only report samples that were actually loaded
+            if 'samples' in query:
+                return [s for s in ','.join(query['samples']).split(',') if s in data.sample_set]
+            return data.samples[:initial_samples]
+        
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            
+            try:
+                #report page, only the selected samples are embedded (all ranks, the report filters them itself)
+                if url.path in ('/', '/index.html'):
+                    samples = self.requested_samples(query)
+                    summary_header, summary_rows = data.summary_slice(samples)
+                    taxonomy_header, taxonomy_rows = data.taxonomy_slice(samples)
+                    payload = {
+                        "startIdx": "@@METAXSFR@@INPUT@@START@@",
+                        "logData": {
+                            "served_from": os.path.abspath(os.path.dirname(data.parsed_dir)),
+                            "samples_loaded": len(samples),
+                            "samples_total": len(data.samples),
+                            "created": datetime.datetime.now().isoformat()
+                        },
+                        "sampleSummary": rows_to_flat_string(summary_header, summary_rows) if summary_header else 'NA',
+                        "sampleTaxonomy": rows_to_flat_string(taxonomy_header, taxonomy_rows) if taxonomy_header else 'NA',
+                        "endIdx": "@@METAXSFR@@INPUT@@END@@"
+                    }
+                    html = find_and_replace_json_block(template_content, payload["startIdx"], payload["endIdx"], payload)
+                    self.send_body(html.encode('utf-8'), 'text/html; charset=utf-8')
+                
+                elif url.path == '/api/samples':
+                    self.send_json(data.samples)
+                
+                elif url.path == '/api/summary':
+                    header, rows = data.summary_slice(self.requested_samples(query)) if 'samples' in query else data.load_summary()
+                    self.send_json(summary_records(header, rows))
+                
+                elif url.path == '/api/taxonomy':
+                    if 'samples' not in query:
+                        self.send_json({"error": "samples query parameter is required"}, 400)
+                        return
+                    header, rows = data.taxonomy_slice(self.requested_samples(query), query.get('rank', [None])[0])
+                    self.send_json(taxonomy_records(header, rows))
+                
+                #taxa by name prefix with the samples they occur in, from the taxon search index
+                elif url.path == '/api/search':
+                    search_query = query.get('q', [''])[0]
+                    if not search_query.strip():
+                        self.send_json({"error": "q query parameter is required"}, 400)
+                        return
+                    try:
+                        limit = int(query.get('limit', ['50'])[0])
+                    except ValueError:
+                        self.send_json({"error": "limit must be an integer"}, 400)
+                        return
+                    self.send_json(data.search_taxa(search_query, query.get('rank', [None])[0], limit))
+                
+                #merged tree of the selected samples, same structure as taxonomyTree.json from --taxonomy-tree
+                elif url.path == '/api/tree':
+                    if 'samples' not in query:
+                        self.send_json({"error": "samples query parameter is required"}, 400)
+                        return
+                    header, rows = data.taxonomy_slice(self.requested_samples(query))
+                    self.send_json(build_taxonomy_tree(header, rows))
+                
+                else:
+                    self.send_json({"error": f"not found: {url.path}"}, 404)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except Exception as e:
+                print(f"Error: {self.path}: {str(e)}")
+                self.send_json({"error": str(e)}, 500)
+        
+        def log_message(self, format, *args):
+            print(f"+++ {self.address_string()} {format % args}")
+    
+    return MetaxsfrRequestHandler
+
+def is_loopback_host(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def run_server(results_directory, host, port, initial_samples, cache_size):
+    data = ReportData(results_directory, cache_size)
+    with open(find_template(), 'r', encoding='utf-8') as f:
+        template_content = f.read()
+    
+    handler = make_request_handler(data, template_content, initial_samples)
+    server_class = ThreadingHTTPServer
+    if ':' in host:
+        server_class = type('ThreadingHTTPServerV6', (ThreadingHTTPServer,), {'address_family': socket.AF_INET6})
+    server = server_class((host, port), handler)
+    print(f"+++ Serving {len(data.samples)} samples from {results_directory}")
+    print(f"+++ Open http://{host}:{port}/ (first {initial_samples} samples, select with ?samples=a,b)")
+    print("+++ JSON API: /api/samples, /api/summary?samples=a,b, /api/taxonomy?samples=a,b&rank=G, /api/tree?samples=a,b, /api/search?q=esch&rank=G")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n+++ METAXSFR server stopped")
+    finally:
+        server.server_close()
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="metaxsfr serve",
+        description="Serve a METAXSFR results directory locally, loading sample data on demand",
+        epilog="Example: metaxsfr serve results --port 8000",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("results_directory", help="METAXSFR results directory (with ParsedReports/ and TemplateInputs/)")
+    parser.add_argument("--host", default="127.0.0.1",
+                       help="Loopback address to bind (localhost, 127.0.0.1, ::1), the server has no authentication")
+    parser.add_argument("--port", type=int, default=8000,
+                       help="Port to listen on")
+    parser.add_argument("--initial-samples", type=int, default=20,
+                       help="Number of samples embedded in the first page when none are selected")
+    parser.add_argument("--cache-size", type=int, default=256,
+                       help="Number of parsed per-sample tables kept in the LRU cache")
+    
+    args = parser.parse_args(argv)
+    if not is_loopback_host(args.host):
+        print(f"Error: --host {args.host} is not a loopback address, metaxsfr serve only runs on localhost")
+        sys.exit(1)
+    run_server(args.results_directory, args.host, args.port, args.initial_samples, args.cache_size)
+
 def main():
+    #subcommands
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        return query_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        return serve_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(
         prog="metaxsfr",
         description="METAXSFR: Metagenome Taxonomic Explorer in a Single-File Report",
-        epilog="Example: metaxsfr -r 'reports/*.txt' -t bracken -d gtdb -o results",
+        epilog="Example: metaxsfr -r 'reports/*.txt' -t bracken -d gtdb -o results. "
+               "See also: metaxsfr query -h, metaxsfr serve -h",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
     
@@ -178,19 +750,37 @@ def main():
     
     #required params
     parser.add_argument("-r", "--reports", required=True,
-                       help="Path to report file(s). Can use wildcards like 'reports/*.txt' (must be quoted)")
+                       help="Path to report file(s). Can use wildcards like 'reports/*.txt' (must be quoted), "
+                            "or tar/zip archive(s) of reports")
     parser.add_argument("-t", "--report-type", required=True, choices=SUPPORTED_REPORT_TYPES,
-                       help="Type of taxonomic profiling report")
+                       help="Type of taxonomic profiling report (*-combined: one combine_kreports.py table, "
+                            "combine_bracken_outputs.py tables are not supported)")
     parser.add_argument("-d", "--database", required=True, choices=SUPPORTED_DATABASES,
                        help="Taxonomic database used for classification")
     
     #optional params
     parser.add_argument("-o", "--output", default="results",
                        help="Output directory for results")
+    parser.add_argument("--archive-glob", default="*",
+                       help="Glob selecting report members inside tar/zip archives, e.g. '*.kreport.txt'")
+    parser.add_argument("--archive-threads", type=int, default=4,
+                       help="Parallel parse workers per archive (capped to this machine's cpus with --executor local)")
     parser.add_argument("--min-abundance", type=float, default=0.01,
                        help="Minimum abundance threshold (percentage)")
+    parser.add_argument("--compile-chunk-size", type=int, default=100,
+                       help="Number of samples compiled per parallel chunk before the final merge")
     parser.add_argument("--executor", default="local",
                        help="Nextflow executor to use")
+    parser.add_argument("--no-resource-estimate", action="store_true",
+                       help="Do not generate per-process cpus/memory config from report sizes")
+    parser.add_argument("--sqlite", action="store_true",
+                       help="Also write an indexed SQLite query database (metaxsfr.sqlite)")
+    parser.add_argument("--taxonomy-tree", action="store_true",
+                       help="Also compile TemplateInputs/taxonomyTree.json, one merged taxonomy tree with per-sample abundance vectors "
+                            "(same structure as metaxsfr serve /api/tree; not embedded in the report, the current template does not read it)")
+    parser.add_argument("--search-index", action="store_true",
+                       help="Also write FinalReport/taxonSearchIndex.json, taxa sorted by name with prefix ranges, "
+                            "used by metaxsfr serve /api/search (not embedded in the report, the current template does not read it)")
     
     #nextflow related params
     parser.add_argument("--resume", action="store_true",
@@ -213,7 +803,14 @@ def main():
         resume=args.resume,
         config=args.config,
         nf_args=args.nf_args,
-        version=version
+        version=version,
+        estimate_resources_enabled=not args.no_resource_estimate,
+        sqlite=args.sqlite,
+        taxonomy_tree=args.taxonomy_tree,
+        compile_chunk_size=args.compile_chunk_size,
+        archive_glob=args.archive_glob,
+        archive_threads=args.archive_threads,
+        search_index=args.search_index
     )
 
 if __name__ == "__main__":